@@ -4,29 +4,73 @@ VirtuNova SEO Audit Toolkit
 Fully automated crawler + analyzer + PDF + Web UI generator
 """
 
-import argparse, asyncio, json, os, re, time
-from collections import deque
+import argparse, asyncio, functools, hashlib, json, os, re, time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from urllib.parse import urljoin, urlparse
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.units import inch
 import aiohttp
-from bs4 import BeautifulSoup
+from lxml import etree, html as lh
 import validators
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 USER_AGENT = "VirtuNova-SEO-Toolkit/1.0 (+https://virtunova.com)"
 MAX_CONCURRENT_REQUESTS = 8
 REQUEST_TIMEOUT = 20
 DEFAULT_MAX_PAGES = 100
+MAX_RESPONSE_BYTES = 2_000_000
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+# Links to these are never HTML pages, so they are not worth a request.
+SKIP_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico",
+    ".zip", ".gz", ".mp3", ".mp4", ".css", ".js", ".xml",
+)
+
+# Response headers kept per page; the rest of the header block is not used by the audit.
+SEO_HEADERS = ("content-type", "content-length", "x-robots-tag", "cache-control", "link")
+
+_RE_WHITESPACE = re.compile(rb"\s+")
+
+
+def make_session():
+    connector = aiohttp.TCPConnector(
+        resolver=aiohttp.AsyncResolver(),
+        limit=MAX_CONCURRENT_REQUESTS,
+        limit_per_host=MAX_CONCURRENT_REQUESTS,
+        ttl_dns_cache=300,
+        use_dns_cache=True,
+        enable_cleanup_closed=True,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers={"User-Agent": USER_AGENT},
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+    )
+
+
+async def read_capped(resp, limit=MAX_RESPONSE_BYTES):
+    body = bytearray()
+    async for chunk in resp.content.iter_chunked(64 * 1024):
+        body += chunk
+        if len(body) >= limit:
+            break
+    return bytes(body[:limit])
 
 
 async def fetch(session, url):
-    headers = {"User-Agent": USER_AGENT}
     try:
-        async with session.get(url, headers=headers, timeout=REQUEST_TIMEOUT) as resp:
-            text = await resp.text(errors="ignore")
-            return {"url": url, "status": resp.status, "text": text, "headers": dict(resp.headers)}
+        async with session.get(url) as resp:
+            headers = {k: resp.headers[k] for k in SEO_HEADERS if k in resp.headers}
+            result = {"url": url, "status": resp.status, "headers": headers}
+            if "content-type" in headers and resp.content_type not in HTML_CONTENT_TYPES:
+                return result
+            # The raw bytes go straight to lxml, which decodes them in C.
+            result["body"] = await read_capped(resp)
+            result["charset"] = resp.charset
+            return result
     except Exception as e:
         return {"url": url, "status": None, "error": str(e)}
 
@@ -34,61 +78,163 @@ async def fetch(session, url):
 def normalize_url(base, href):
     if not href or href.startswith(("javascript:", "mailto:", "#")):
         return None
-    joined = urljoin(base, href)
-    parsed = urlparse(joined)
-    return parsed._replace(fragment="").geturl()
-
-
-def analyze_html(url, text):
-    soup = BeautifulSoup(text, "lxml")
-    result = {}
-    title_tag = soup.find("title")
-    title = title_tag.string.strip() if title_tag and title_tag.string else ""
-    desc_tag = soup.find("meta", attrs={"name": re.compile("description", re.I)})
-    desc = desc_tag["content"].strip() if desc_tag and desc_tag.get("content") else ""
-    h1s = [h.get_text(strip=True) for h in soup.find_all("h1")]
-    imgs = soup.find_all("img")
-    imgs_missing_alt = [i.get("src") for i in imgs if not i.get("alt")]
-    result.update({
+    # Absolute links resolve the same on every page, so drop the base from the cache key;
+    # site-wide navigation then hits the cache across the whole crawl.
+    if href.startswith(("http://", "https://")):
+        base = ""
+    return _resolve_url(base, href)
+
+
+@functools.lru_cache(maxsize=65536)
+def _resolve_url(base, href):
+    url = urljoin(base, href).split("#", 1)[0]
+    if url.split("?", 1)[0].lower().endswith(SKIP_EXTENSIONS):
+        return None
+    return url
+
+
+def content_digest(body):
+    # Whitespace is dropped so re-indented or re-wrapped copies of a page hash the same.
+    return hashlib.blake2b(_RE_WHITESPACE.sub(b"", body), digest_size=16).digest()
+
+
+@functools.lru_cache(maxsize=None)
+def _html_parser(encoding=None):
+    # One parser per declared charset; none of them builds the node types analyze_html ignores.
+    return lh.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True, remove_blank_text=True)
+
+
+def _parse_document(body, charset=None):
+    # An HTTP charset wins over the page's own declaration. Without either, libxml2 would
+    # assume Latin-1, so fall back to UTF-8 as aiohttp's text() used to.
+    if charset is None:
+        head = body[:1024].lower()
+        if b"charset" not in head and b"encoding" not in head:
+            charset = "utf-8"
+    try:
+        parser = _html_parser(charset)
+    except LookupError:
+        parser = _html_parser("utf-8")
+    try:
+        return lh.document_fromstring(body, parser=parser)
+    except etree.ParserError:
+        return lh.document_fromstring("<html></html>")
+
+
+def analyze_html(url, body, charset=None):
+    doc = _parse_document(body, charset)
+    title = desc = None
+    h1s, hrefs = [], []
+    img_total = missing_alt = 0
+    # A single walk over only the tags the audit reads; lxml does the tag filtering in C.
+    for el in doc.iter("title", "meta", "h1", "img", "a"):
+        tag = el.tag
+        if tag == "a":
+            href = el.get("href")
+            if href is not None:
+                hrefs.append(href)
+        elif tag == "img":
+            img_total += 1
+            if not el.get("alt"):
+                missing_alt += 1
+        elif tag == "h1":
+            h1s.append("".join(t.strip() for t in el.itertext()))
+        elif tag == "meta":
+            if desc is None and (el.get("name") or "").strip().lower() == "description":
+                desc = (el.get("content") or "").strip()
+        elif title is None:
+            title = (el.text or "").strip()
+    return _page_result(title or "", desc or "", h1s, img_total, missing_alt), hrefs
+
+
+def _page_result(title, desc, h1s, img_total, missing_alt):
+    return {
         "title": {"text": title, "length": len(title)},
         "meta_description": {"text": desc, "length": len(desc)},
         "h1": {"count": len(h1s), "texts": h1s},
-        "images": {"total": len(imgs), "missing_alt_count": len(imgs_missing_alt)},
-    })
-    return result
+        "images": {"total": img_total, "missing_alt_count": missing_alt},
+    }
 
 
 class SEOCrawler:
     def __init__(self, seed_url, max_pages=DEFAULT_MAX_PAGES):
         self.seed = seed_url
-        self.to_visit = deque([seed_url])
-        self.seen = set([seed_url])
+        # The crawl stays on the seed's netloc under either scheme; precomputing the origin
+        # prefixes lets links be filtered without parsing them.
+        netloc = urlparse(seed_url).netloc
+        self._seed_origins = (f"http://{netloc}", f"https://{netloc}")
+        self.queue = asyncio.Queue()
+        self.queue.put_nowait(seed_url)
+        # 64-bit hashes of every queued URL; the URLs themselves live only in the queue and results.
+        self.seen = {hash(seed_url)}
         self.results = {}
+        # Body digest -> first URL seen with that content.
+        self.content_seen = {}
         self.max_pages = max_pages
 
-    async def run(self):
-        async with aiohttp.ClientSession() as session:
-            sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
-
-            async def worker():
-                while self.to_visit:
-                    url = self.to_visit.popleft()
-                    async with sem:
-                        data = await fetch(session, url)
-                    self.results[url] = {"fetch": data}
-                    if data.get("status") == 200 and data.get("text"):
-                        analysis = analyze_html(url, data["text"])
-                        self.results[url]["analysis"] = analysis
-                        soup = BeautifulSoup(data["text"], "lxml")
-                        for a in soup.find_all("a", href=True):
-                            n = normalize_url(url, a["href"])
-                            if n and urlparse(n).netloc == urlparse(self.seed).netloc and n not in self.seen:
-                                if len(self.seen) < self.max_pages:
-                                    self.seen.add(n)
-                                    self.to_visit.append(n)
-
-            tasks = [asyncio.create_task(worker()) for _ in range(MAX_CONCURRENT_REQUESTS)]
-            await asyncio.gather(*tasks)
+    def _is_same_site(self, url):
+        for origin in self._seed_origins:
+            if url.startswith(origin):
+                rest = url[len(origin):]
+                return not rest or rest[0] in "/?"
+        return False
+
+    def _enqueue_links(self, url, hrefs):
+        # Once max_pages URLs have been queued nothing else can be added, so stop looking.
+        if len(self.seen) >= self.max_pages:
+            return
+        for href in hrefs:
+            n = normalize_url(url, href)
+            if not n or not self._is_same_site(n):
+                continue
+            h = hash(n)
+            if h not in self.seen:
+                self.seen.add(h)
+                self.queue.put_nowait(n)
+                if len(self.seen) >= self.max_pages:
+                    return
+
+    async def run(self, session=None):
+        if session is None:
+            async with make_session() as session:
+                return await self.run(session)
+
+        loop = asyncio.get_running_loop()
+
+        async def worker():
+            while True:
+                url = await self.queue.get()
+                try:
+                    data = await fetch(session, url)
+                    # Only the outcome of the fetch is kept; the body is needed just for analysis.
+                    body = data.get("body")
+                    fetch_meta = {"status": data["status"]}
+                    if "error" in data:
+                        fetch_meta["error"] = data["error"]
+                    self.results[url] = {"fetch": fetch_meta}
+                    if data["status"] == 200 and body:
+                        original = self.content_seen.setdefault(content_digest(body), url)
+                        if original != url:
+                            self.results[url]["duplicate_of"] = original
+                        else:
+                            analysis, hrefs = await loop.run_in_executor(
+                                parse_pool, analyze_html, url, body, data["charset"]
+                            )
+                            self.results[url]["analysis"] = analysis
+                            self._enqueue_links(url, hrefs)
+                finally:
+                    self.queue.task_done()
+
+        # Workers block on the queue while pages are in flight; the crawl ends once every
+        # queued URL has been processed. Parsing is CPU-bound, so it runs in child processes
+        # and the event loop keeps fetching meanwhile. If a worker fails, the TaskGroup
+        # cancels the rest and re-raises instead of leaving join() waiting forever.
+        with ProcessPoolExecutor() as parse_pool:
+            async with asyncio.TaskGroup() as tg:
+                workers = [tg.create_task(worker()) for _ in range(MAX_CONCURRENT_REQUESTS)]
+                await self.queue.join()
+                for task in workers:
+                    task.cancel()
 
 
 def score_page(analysis):
@@ -105,10 +251,49 @@ def score_page(analysis):
     return {"score": max(0, score), "reasons": reasons}
 
 
+def _dumps(data, indent=0):
+    if orjson is not None:
+        out = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        out = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    # JSON strings never contain raw newlines, so this only shifts structural lines.
+    return out.replace(b"\n", b"\n" + b" " * indent) if indent else out
+
+
+def write_report(report, path):
+    # Same bytes as dumping the whole report with indent=2, but serialized one page at a
+    # time so the encoded document is never held in memory all at once.
+    with open(path, "wb") as f:
+        f.write(b"{")
+        for i, (key, value) in enumerate(report.items()):
+            f.write(b"," if i else b"")
+            f.write(b"\n  " + _dumps(key) + b": ")
+            if key != "pages" or not value:
+                f.write(_dumps(value, 2))
+                continue
+            f.write(b"{")
+            for j, (url, page) in enumerate(value.items()):
+                f.write(b"," if j else b"")
+                f.write(b"\n    " + _dumps(url) + b": " + _dumps(page, 4))
+            f.write(b"\n  }")
+        f.write(b"\n}" if report else b"}")
+
+
+@functools.cache
+def _pdf_styles():
+    from reportlab.lib.styles import getSampleStyleSheet
+    return getSampleStyleSheet()
+
+
 def generate_pdf_report(report_data, output_path):
+    # reportlab is slow to import and only needed here, so crawling and --help don't pay for it.
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     doc = SimpleDocTemplate(output_path, pagesize=A4)
-    styles = getSampleStyleSheet()
+    styles = _pdf_styles()
     elements = [
         Paragraph("<font size=18 color='#A020F0'><b>VirtuNova SEO Audit Report</b></font>", styles["Title"]),
         Spacer(1, 0.25 * inch),
@@ -118,9 +303,12 @@ def generate_pdf_report(report_data, output_path):
     ]
     total_pages = len(report_data["pages"])
     elements.append(Paragraph(f"<b>Total Pages Crawled:</b> {total_pages}", styles["Normal"]))
-    issues = [(u, p["scores"]["reasons"]) for u, p in report_data["pages"].items() if p["scores"]["reasons"]]
-    elements.append(Paragraph(f"<b>Pages with issues:</b> {len(issues)}", styles["Normal"]))
-    for url, reasons in issues[:10]:
+    # Only the first 10 issue pages are rendered, so count the rest without materialising them.
+    issues = ((u, p["scores"]["reasons"]) for u, p in report_data["pages"].items() if p["scores"]["reasons"])
+    shown = list(islice(issues, 10))
+    issue_count = len(shown) + sum(1 for _ in issues)
+    elements.append(Paragraph(f"<b>Pages with issues:</b> {issue_count}", styles["Normal"]))
+    for url, reasons in shown:
         elements.append(Paragraph(f"<b>{url}</b>", styles["Normal"]))
         for r in reasons:
             elements.append(Paragraph(f"- {r}", styles["Normal"]))
@@ -133,15 +321,15 @@ def generate_pdf_report(report_data, output_path):
 
 async def run_audit(seed_url, output_path, max_pages=50):
     crawler = SEOCrawler(seed_url, max_pages=max_pages)
-    await crawler.run()
+    async with make_session() as session:
+        await crawler.run(session)
     report = {"site": seed_url, "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"), "pages": {}}
     for url, data in crawler.results.items():
         if data.get("analysis"):
             scores = score_page(data["analysis"])
             report["pages"][url] = {"analysis": data["analysis"], "scores": scores}
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2)
+    write_report(report, output_path)
     generate_pdf_report(report, os.path.join(os.path.dirname(output_path), "SEO_Audit_Report.pdf"))
     print("Audit complete. Report saved to", output_path)
     return report